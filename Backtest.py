@@ -0,0 +1,133 @@
+# This script holds the strategy logic of one pair, shared by the notebook and ParameterSweep:
+# build_pair_frame() labels each day with the direction of the spread return,
+# feature_columns() lists the indicators used as model features and
+# backtest_pair() backtests the model predictions.
+
+import numpy as np
+import pandas as pd
+
+__all__ = ['DROP_SUFFIXES', 'build_pair_frame', 'feature_columns', 'backtest_pair']
+
+# Indicator columns that are not used as model features (besides the raw prices)
+DROP_SUFFIXES = [
+    'OPEN', 'HIGH', 'CLOSE', 'LOW', 'VOLUME', 'VWAP', 'Percent_Change',
+    'volatility_bbhi', 'volatility_bbli', 'volatility_kchi', 'volatility_kcli',
+    'trend_psar_up', 'trend_psar_down', 'trend_psar_up_indicator', 'trend_psar_down_indicator',
+    'volatility_kcl', 'volatility_dcl', 'volatility_dch', 'volatility_dcm', 'volatility_bbm',
+    'volatility_kch', 'volatility_kcc',
+    'trend_ichimoku_b', 'trend_ichimoku_base', 'trend_visual_ichimoku_b', 'trend_ichimoku_conv',
+    'trend_ichimoku_a',
+    'trend_ema_fast', 'trend_ema_slow', 'trend_sma_fast', 'trend_aroon_ind',
+    'trend_aroon_up', 'trend_visual_ichimoku_a', 'trend_aroon_down', 'momentum_ppo_signal',
+    'momentum_kama',
+    'others_dlr', 'momentum_ppo', 'momentum_pvo', 'momentum_pvo_signal', 'trend_macd_signal',
+    'trend_macd', 'trend_kst', 'trend_kst_sig',
+    'trend_vortex_ind_neg', 'trend_vortex_ind_pos', 'trend_adx_pos', 'trend_adx_neg',
+    'momentum_stoch_rsi',
+    'volatility_bbh', 'volatility_bbl', 'volatility_bbp', 'volatility_dcp', 'volatility_kcp',
+    'volume_sma_em', 'volume_vwap', 'volume_nvi', 'trend_trix',
+]
+LABEL_COLS = ["label", "pair", "date", "entry_price", "exit_price", "spread_return", "upper", "lower"]
+
+
+def build_pair_frame(df1_ta, df2_ta, stock1, stock2, h, lag_days, window_thr, vol_thr):
+    """
+    Join the indicators of both stocks and label each day with the direction of the spread return.
+    """
+    df_pair = pd.concat([df1_ta.add_prefix(f"{stock1}_"), df2_ta.add_prefix(f"{stock2}_")], axis=1, join='inner')
+    df_pair["pair"] = f"{stock1} - {stock2}"
+    df_pair["date"] = df_pair.index
+
+    # We use all the info at day t to predict the relationship between open at day t+1
+    # and VWAP at day t+lag_days+1
+    df_pair["entry_price"]   = h * df_pair[f"{stock1}_OPEN"].shift(-1) - df_pair[f"{stock2}_OPEN"].shift(-1)
+    df_pair["exit_price"]    = h * df_pair[f"{stock1}_VWAP"].shift(-lag_days-1) - df_pair[f"{stock2}_VWAP"].shift(-lag_days-1)
+    df_pair["spread_return"] = df_pair["exit_price"] - df_pair["entry_price"]
+
+    vol  = df_pair["spread_return"].rolling(window=window_thr).std()
+    mean = df_pair["spread_return"].rolling(window=window_thr).mean()
+    df_pair["upper"] = vol_thr * vol + mean
+    df_pair["lower"] = -vol_thr * vol + mean
+
+    df_pair["label"] = 0
+    df_pair.loc[df_pair["spread_return"] > df_pair["upper"], "label"] = 1
+    df_pair.loc[df_pair["spread_return"] < df_pair["lower"], "label"] = -1
+
+    return df_pair.drop(columns=[f"{stock1}_ticker", f"{stock2}_ticker"])
+
+def feature_columns(df_pair, stock1, stock2):
+    drop_cols = set(LABEL_COLS)
+    drop_cols.update(f"{stock}_{suffix}" for stock in (stock1, stock2) for suffix in DROP_SUFFIXES)
+    return [col for col in df_pair.columns if col not in drop_cols]
+
+def _open_position(side, P1, P2, h, cap):
+    denom = abs(h)*P1 + P2
+    q = cap/denom
+    if side == +1:   # buy h*S1, sell S2
+        return +h*q, -q
+    # side == -1: buy S2, sell h*S1
+    return -h*q, +q
+
+def backtest_pair(pred_df, open_s1, open_s2, vwap_s1, vwap_s2, h, cap):
+    """
+    Backtest the predictions of one pair: open at the OPEN price of the next day,
+    close at the VWAP when the signal changes.
+    Returns:
+        nav_mtm, nav_real: Series, marked-to-market and realized NAV
+        trade_log: DataFrame, one row per OPEN/CLOSE
+    """
+    pred_df = pred_df.sort_values('Date').reset_index(drop=True)
+    pred_df['y_pred_shift_1'] = pred_df['y_pred'].shift(1).fillna(0).astype(int)
+    pred_df['y_pred_shift_2'] = pred_df['y_pred'].shift(2).fillna(0).astype(int)
+
+    log = []
+    cash = cap
+    margin = 0.0
+    pos1 = pos2 = 0.0
+    nav_mtm = []
+    nav_real = []
+    sp1, sp2 = 0.0, 0.0
+
+    for _, row in pred_df.iterrows():
+        sb = 0
+        day = row.Date
+        sig = row.y_pred_shift_1
+        pre = row.y_pred_shift_2
+        open1, open2 = open_s1.loc[day], open_s2.loc[day]
+        vwap1, vwap2 = vwap_s1.loc[day], vwap_s2.loc[day]
+
+        # Close position: previous position exists and signal != pre
+        if pre != 0 and sig != pre and pos1 != 0:
+            cash = pos1 * vwap1 + pos2 * vwap2 + margin
+            margin = 0.0
+            pnl = (vwap1 - log[-1]['price_s1'])*pos1 + (vwap2 - log[-1]['price_s2'])*pos2
+            log.append({'date': day, 'action': 'CLOSE', 'side': pre,
+                        'qty1': -pos1, 'qty2': -pos2, 'price_s1': vwap1, 'price_s2': vwap2,
+                        'value': cash, 'pnl': pnl})
+            sp1 = log[-1]['price_s1']
+            sp2 = log[-1]['price_s2']
+            pos1 = pos2 = 0.0
+            sb = 1
+
+        # Open position: no previous position and signal != 0
+        if pos1 == 0.0 and sig != 0:
+            q1, q2 = _open_position(sig, open1, open2, h, cap)
+            log.append({'date': day, 'action': 'OPEN', 'side': sig,
+                        'qty1': q1, 'qty2': q2, 'price_s1': open1, 'price_s2': open2,
+                        'value': cash, 'pnl': np.nan})
+            margin = cash - q1*open1 - q2*open2
+            cash = 0
+            pos1, pos2 = q1, q2
+
+        # Daily NAV
+        nav_mtm.append((day, cash + pos1*vwap1 + pos2*vwap2 + margin))
+        if sb:
+            nav_real.append((day, cash + pos1*sp1 + pos2*sp2 + margin))
+        elif log:
+            nav_real.append((day, cash + pos1*log[-1]['price_s1'] + pos2*log[-1]['price_s2'] + margin))
+        else:
+            nav_real.append((day, cash))
+
+    nav_mtm  = pd.Series(dict(nav_mtm), dtype=float).sort_index()
+    nav_real = pd.Series(dict(nav_real), dtype=float).sort_index()
+    return nav_mtm, nav_real, pd.DataFrame(log)
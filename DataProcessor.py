@@ -2,6 +2,8 @@ import numpy as np
 import pandas as pd
 from RKDRetriever import *
 
+__all__ = ['DataProcessor']
+
 class DataProcessor:
     def __init__(self, start_data, end_data):
         self.start_data = start_data
@@ -1,6 +1,12 @@
 import pandas as pd
 import numpy as np
-import ta
+
+__all__ = ['FeatureEngineering']
+
+
+def _ta():
+    import ta
+    return ta
 
 
 class FeatureEngineering():
@@ -19,68 +25,68 @@ class FeatureEngineering():
 
     def RSI(self):
         if 'RSI' in self.derivatives:
-            self.data['RSI'] = ta.momentum.rsi(self.data['CLOSE'], fillna = True)
+            self.data['RSI'] = _ta().momentum.rsi(self.data['CLOSE'], fillna = True)
             return True
         return False
     
     def WilliamsR(self):
         if 'WilliamsR' in self.derivatives:
-            self.data['WilliamsR'] = ta.momentum.williams_r(high = self.data['HIGH'], 
+            self.data['WilliamsR'] = _ta().momentum.williams_r(high = self.data['HIGH'], 
                             low = self.data['LOW'], close = self.data['CLOSE'], fillna = True)
             return True
         return False
     
     def PPO(self):
         if 'PPO' in self.derivatives:
-            self.data['PPO'] = ta.momentum.ppo(close = self.data['CLOSE'], fillna = True)
+            self.data['PPO'] = _ta().momentum.ppo(close = self.data['CLOSE'], fillna = True)
             return True
         return False
     
     def CMF(self):
         if 'CMF' in self.derivatives:
-            self.data['CMF'] = ta.volume.chaikin_money_flow(high = self.data['HIGH'], low = self.data['LOW'], 
+            self.data['CMF'] = _ta().volume.chaikin_money_flow(high = self.data['HIGH'], low = self.data['LOW'], 
                             close = self.data['CLOSE'], volume = self.data['VOLUME'], fillna = True)
             return True
         return False
     
     def FI(self):
         if 'FI' in self.derivatives:
-            self.data['FI'] = ta.volume.force_index(close = self.data['CLOSE'], 
+            self.data['FI'] = _ta().volume.force_index(close = self.data['CLOSE'], 
                                     volume = self.data['VOLUME'], fillna = True)
             return True
         return False
     
     def VPT(self):
         if 'VPT' in self.derivatives:
-            self.data['VPT'] = ta.volume.volume_price_trend(close = self.data['CLOSE'], 
+            self.data['VPT'] = _ta().volume.volume_price_trend(close = self.data['CLOSE'], 
                                     volume = self.data['VOLUME'], fillna = True)
             return True
         return False
     
     def ArronUp(self):
         if 'ArronUp' in self.derivatives:
-            self.data['ArronUp'] = ta.trend.aroon_up(close = self.data['CLOSE'], 
+            self.data['ArronUp'] = _ta().trend.aroon_up(close = self.data['CLOSE'], 
                                     fillna = True)
             return True
         return False
     
     def ArronDown(self):
         if 'ArronDown' in self.derivatives:
-            self.data['ArronDown'] = ta.trend.aroon_down(close = self.data['CLOSE'], 
+            self.data['ArronDown'] = _ta().trend.aroon_down(close = self.data['CLOSE'], 
                                     fillna = True)
             return True
         return False
     
     def CCI(self):
         if 'CCI' in self.derivatives:
-            self.data['CCI'] = ta.trend.cci(high = self.data['HIGH'], low = self.data['LOW'], 
+            self.data['CCI'] = _ta().trend.cci(high = self.data['HIGH'], low = self.data['LOW'], 
                             close = self.data['CLOSE'], fillna = True)
             return True
         return False
     
     def MACD(self):
         if 'MACD' in self.derivatives:
-            self.data['MACD'] = ta.trend.macd(close = self.data['CLOSE'], fillna = True)
+            self.data['MACD'] = _ta().trend.macd(close = self.data['CLOSE'], fillna = True)
             return True
         return False
     
@@ -1,8 +1,9 @@
 import pandas as pd
 import numpy as np
-from sklearn.cluster import OPTICS
 from itertools import combinations
-from statsmodels.tsa.stattools import coint
+
+__all__ = ['compute_partial_corr', 'compute_pc_distance_matrix', 'select_pairs_from_clusters',
+           'cluster_pairs', 'Engle_Granger_test', 'pairs_selection']
 
 def compute_partial_corr(x, y, m):
     """
@@ -84,6 +85,7 @@ def select_pairs_from_clusters(labels, stock_list):
 
 
 def Engle_Granger_test(pairs, df, pvalue_threshold):
+    from statsmodels.tsa.stattools import coint
     cointegrated_pairs = []
     for s1_name, s2_name, cluster in pairs:
         s1 = df[s1_name]
@@ -117,12 +119,24 @@ def Engle_Granger_test(pairs, df, pvalue_threshold):
     
     return pd.DataFrame(cointegrated_pairs)
 
-def pairs_selection(features_train_returns, SPX_train_returns, features_train_close, min_sample, pvalue_threshold):
-    pc_distance_matrix = compute_pc_distance_matrix(features_train_returns, SPX_train_returns)
-    optics_model = OPTICS(min_samples=2, metric="precomputed")
+def cluster_pairs(pc_distance_matrix, min_sample=2):
+    """
+    Cluster stocks with OPTICS on a precomputed distance matrix and return the candidate pairs.
+    Parameters:
+        pc_distance_matrix: DataFrame, output of compute_pc_distance_matrix
+        min_sample: int, min_samples of the OPTICS model
+    Returns:
+        pairs: list of tuples (stock1, stock2, cluster)
+    """
+    from sklearn.cluster import OPTICS
+    optics_model = OPTICS(min_samples=min_sample, metric="precomputed")
     labels = optics_model.fit_predict(pc_distance_matrix.values)
     stock_list = list(pc_distance_matrix.index)
-    pairs = select_pairs_from_clusters(labels, stock_list)
+    return select_pairs_from_clusters(labels, stock_list)
+
+def pairs_selection(features_train_returns, SPX_train_returns, features_train_close, min_sample, pvalue_threshold):
+    pc_distance_matrix = compute_pc_distance_matrix(features_train_returns, SPX_train_returns)
+    pairs = cluster_pairs(pc_distance_matrix, min_sample)
     
     coin_pairs = Engle_Granger_test(pairs,features_train_close,pvalue_threshold)
     
@@ -0,0 +1,445 @@
+# This script runs the rolling-window pairs trading pipeline of the notebook
+# over a grid of parameters.
+# The pipeline is split into stages (pair candidates of a training window,
+# indicators of a stock, model + backtest of one pair in one window) and every
+# stage result is a node of a dependency graph, keyed by exactly the inputs it
+# consumes. Grid points that need the same intermediate share one node, so it is
+# computed only once, and independent nodes are run in parallel worker processes.
+# The pair selection and the chaining of the windows are cheap and done per grid point.
+# run_sweep() writes the NAV and the trade log of each grid point to a file named
+# through stdout.smartFilename() and returns a consolidated results table.
+# The labels, features and backtest of a pair come from Backtest, like in the notebook.
+
+import os
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from itertools import product
+
+import numpy as np
+import pandas as pd
+from pandas.tseries.offsets import BDay
+
+from PairsSelection import compute_pc_distance_matrix, cluster_pairs, Engle_Granger_test
+from Backtest import build_pair_frame, feature_columns, backtest_pair
+from stdout import smartFilename
+
+__all__ = ['StageGraph', 'DEFAULT_PARAMS', 'prepare_market_data', 'rolling_windows', 'select_top_pairs',
+           'expand_grid', 'chain_windows', 'summarize', 'run_sweep']
+
+
+# Default values of the notebook (cell 1), used for every parameter missing from the grid
+DEFAULT_PARAMS = {
+    'bw':               120,
+    'hw':               10,
+    'pvalue_threshold': 0.20,
+    'N_top_pairs':      10,
+    'vol_thr':          0.7,
+    'window_thr':       10,
+    'lag_days':         1,
+}
+
+# Market data of the worker process, set once by _init_worker()
+_DATA = None
+
+
+class StageGraph:
+    """
+    A dependency graph of pipeline stages.
+    Each node is identified by a hashable key and computed by func(*dep_results, **kwargs).
+    Adding a node that already exists is a no-op, this is how intermediate results are shared.
+    """
+    def __init__(self):
+        self._nodes = {}
+        self._results = {}
+
+    def add(self, key, func, deps=(), **kwargs):
+        if key not in self._nodes:
+            self._nodes[key] = (func, tuple(deps), kwargs)
+        return key
+
+    def result(self, key):
+        return self._results[key]
+
+    def run(self, executor=None, keep=()):
+        """
+        Compute every node that has no result yet.
+        Parameters:
+            executor: concurrent.futures executor, or None to run in the current process
+            keep: keys whose results must be kept, the other results are released
+                  as soon as all their dependents are computed
+        """
+        keep = set(keep)
+        pending = {key for key in self._nodes if key not in self._results}
+        # Number of pending dependents of each node, to release results early
+        dependents = {}
+        for key in pending:
+            for dep in self._nodes[key][1]:
+                dependents[dep] = dependents.get(dep, 0) + 1
+
+        def ready(key):
+            return all(dep in self._results for dep in self._nodes[key][1])
+
+        def finish(key, value):
+            self._results[key] = value
+            for dep in self._nodes[key][1]:
+                dependents[dep] -= 1
+                if dependents[dep] == 0 and dep not in keep:
+                    del self._results[dep]
+            if dependents.get(key, 0) == 0 and key not in keep:
+                del self._results[key]
+
+        running = {}
+        while pending or running:
+            submitted = [k for k in pending if ready(k)]
+            for key in submitted:
+                pending.discard(key)
+                func, deps, kwargs = self._nodes[key]
+                args = [self._results[dep] for dep in deps]
+                if executor is None:
+                    finish(key, func(*args, **kwargs))
+                else:
+                    running[executor.submit(func, *args, **kwargs)] = key
+            if not running:
+                if not submitted:
+                    raise RuntimeError('Unresolvable dependencies: %s' % sorted(map(str, pending)))
+                continue
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                finish(running.pop(future), future.result())
+
+
+def prepare_market_data(Stocks_flat, SPX):
+    """
+    Build the wide price tables used by all stages.
+    Parameters:
+        Stocks_flat: DataFrame, output of flatten_Stocks() in the notebook (columns date, ticker, OPEN, ...)
+        SPX: DataFrame, output of DataProcessor.get_index()
+    Returns:
+        data: dict with the wide close/return tables, SPX and one DataFrame per ticker
+    """
+    Stocks_flat = Stocks_flat.sort_values(["ticker", "date"]).copy()
+    Stocks_flat["Percent_Change"] = Stocks_flat.groupby("ticker")["CLOSE"].pct_change()
+    stocks = {ticker: df.set_index('date').sort_index()
+              for ticker, df in Stocks_flat.groupby('ticker')}
+    return {
+        'close_wide':   Stocks_flat.pivot(index="date", columns="ticker", values="CLOSE"),
+        'returns_wide': Stocks_flat.pivot(index="date", columns="ticker", values="Percent_Change"),
+        'SPX':          SPX,
+        'stocks':       stocks,
+        'trade_days':   Stocks_flat['date'].drop_duplicates().sort_values().reset_index(drop=True),
+    }
+
+def _init_worker(data):
+    global _DATA
+    _DATA = data
+
+def rolling_windows(trade_days, first_day, bw, hw):
+    """
+    Training and out-of-sample windows of the walk-forward loop.
+    Returns:
+        windows: list of tuples (training_start, training_end, oos_start, oos_end)
+    """
+    windows = []
+    day_idx = trade_days.searchsorted(first_day)
+    while day_idx < len(trade_days):
+        day = trade_days.iloc[day_idx]
+        training_end   = day - BDay(1)
+        training_start = training_end - BDay(bw) + BDay(1)
+        oos_start      = day
+        oos_end        = oos_start + BDay(hw) - BDay(1)
+        if oos_end > trade_days.iloc[-1]:
+            oos_end = trade_days.iloc[-1]
+        windows.append((training_start, training_end, oos_start, oos_end))
+        day_idx = trade_days.searchsorted(oos_end, side="right")
+    return windows
+
+def select_top_pairs(coin_pairs, pvalue_threshold, N_top_pairs):
+    """
+    Keep the N_top_pairs pairs with the lowest p-value below pvalue_threshold.
+    coin_pairs is the output of Engle_Granger_test() run without threshold.
+    """
+    if coin_pairs.empty:
+        return coin_pairs
+    coin_pairs = coin_pairs[coin_pairs['pvalue'] < pvalue_threshold]
+    return coin_pairs.sort_values(by='pvalue', ascending=True).head(N_top_pairs)
+
+
+# ---------------------------------------------------------------------------
+# Stages, run in the worker processes
+# ---------------------------------------------------------------------------
+
+def _candidates_stage(training_start, training_end, min_sample):
+    returns     = _DATA['returns_wide'].loc[training_start:training_end]
+    spx_returns = _DATA['SPX'].loc[training_start:training_end]['SPX']['returns']
+    close       = _DATA['close_wide'].loc[training_start:training_end]
+    pairs = cluster_pairs(compute_pc_distance_matrix(returns, spx_returns), min_sample)
+    # No threshold here: the p-value filter is applied per grid point by select_top_pairs()
+    return Engle_Granger_test(pairs, close, pvalue_threshold=np.inf)
+
+def _indicator_stage(ticker, start, end):
+    from ta import add_all_ta_features
+    df = _DATA['stocks'][ticker].loc[start:end].copy()
+    return add_all_ta_features(df, open="OPEN", high="HIGH", low="LOW", close="CLOSE", volume="VOLUME", fillna=True)
+
+def _pair_model_stage(df1_ta, df2_ta, stock1, stock2, h, window, lag_days, window_thr, vol_thr):
+    """
+    Train the model of one pair and backtest it on the out-of-sample window.
+    The backtest is run with a capital of 1, the NAV and the trade log are linear
+    in the capital so they are rescaled when the windows are chained.
+    Returns None if there is no out-of-sample data, as the notebook skips the pair.
+    """
+    from sklearn.ensemble import RandomForestClassifier
+    training_start, training_end, oos_start, oos_end = window
+    df_pair = build_pair_frame(df1_ta, df2_ta, stock1, stock2, h, lag_days, window_thr, vol_thr)
+    df_pair_train = df_pair[(df_pair["date"] >= training_start) & (df_pair["date"] <= training_end)]
+    df_pair_test  = df_pair[(df_pair["date"] >= oos_start) & (df_pair["date"] <= oos_end)]
+    if df_pair_test.empty:
+        return None
+
+    feature_cols = feature_columns(df_pair, stock1, stock2)
+    rf = RandomForestClassifier(n_estimators=800, max_depth=15, random_state=42,
+                                class_weight={-1: 1, 0: 1, 1: 1})
+    rf.fit(df_pair_train[feature_cols], df_pair_train["label"])
+    y_pred = rf.predict(df_pair_test[feature_cols])
+
+    pred_df = df_pair_test[['date']].rename(columns={'date': 'Date'}).assign(y_pred=y_pred)
+    nav_mtm, _, trade_log = backtest_pair(pred_df,
+                                          df_pair[f"{stock1}_OPEN"], df_pair[f"{stock2}_OPEN"],
+                                          df_pair[f"{stock1}_VWAP"], df_pair[f"{stock2}_VWAP"],
+                                          h, 1.0)
+    return {
+        'pair_nav': nav_mtm.loc[oos_start:oos_end],
+        'trades':   trade_log.assign(pair=f"{stock1}-{stock2}", window_start=oos_start, window_end=oos_end),
+        'y_test':   df_pair_test["label"].tolist(),
+        'y_pred':   y_pred.tolist(),
+    }
+
+
+# ---------------------------------------------------------------------------
+# Sweep
+# ---------------------------------------------------------------------------
+
+def expand_grid(grid):
+    """
+    Cartesian product of the grid, e.g. {'bw': [60, 120], 'hw': [10]} -> 2 parameter dicts.
+    Parameters missing from the grid take their value from DEFAULT_PARAMS.
+    """
+    unknown = set(grid) - set(DEFAULT_PARAMS)
+    if unknown:
+        raise ValueError('Unknown sweep parameters: %s' % sorted(unknown))
+    names = list(DEFAULT_PARAMS)
+    values = [list(grid.get(name, [DEFAULT_PARAMS[name]])) for name in names]
+    return [dict(zip(names, combo)) for combo in product(*values)]
+
+def chain_windows(window_results, first_day, initial_capital):
+    """
+    Chain the unit-capital pair results into the portfolio NAV, the trade log and
+    the predictions of a grid point, reinvesting the capital from one window to the next.
+    Parameters:
+        window_results: list of tuples (window, pair_results), pair_results holds the output of
+                        _pair_model_stage() for each selected pair of the window (None if skipped)
+    Returns:
+        portfolio_nav, trades, y_test, y_pred, and the number of windows that were traded
+    """
+    capital = initial_capital
+    portfolio_nav = pd.Series({first_day: initial_capital}, dtype=float)
+    trades = []
+    y_test, y_pred = [], []
+    n_windows = 0
+    for (_, _, oos_start, oos_end), pair_results in window_results:
+        traded = [result for result in pair_results if result is not None]
+        if not traded:
+            continue
+        n_windows += 1
+        navs = [result['pair_nav'] * capital for result in traded]
+        for result in traded:
+            trade_log = result['trades'].copy()
+            for col in ('qty1', 'qty2', 'value', 'pnl'):
+                if col in trade_log:
+                    trade_log[col] = trade_log[col] * capital
+            trades.append(trade_log)
+            y_test.extend(result['y_test'])
+            y_pred.extend(result['y_pred'])
+
+        ends = [nav.iloc[-1] for nav in navs]
+        capital = float(np.mean(ends))
+
+        full_index = pd.date_range(oos_start, oos_end, freq='B')
+        clean_navs = []
+        for nav in navs:
+            nav = nav.reindex(full_index)
+            nav.iloc[0] = ends[0]
+            nav = nav.ffill()
+            clean_navs.append(nav)
+        # Divided by the number of selected pairs, like N_pairs in the notebook
+        port_nav_window = pd.concat(clean_navs, axis=1).sum(axis=1) / len(pair_results)
+        portfolio_nav = pd.concat([portfolio_nav, port_nav_window.iloc[1:]]).sort_index()
+
+    trades = pd.concat(trades, ignore_index=True) if trades else pd.DataFrame()
+    return portfolio_nav.ffill(), trades, y_test, y_pred, n_windows
+
+def summarize(portfolio_nav, y_test, y_pred):
+    """
+    Performance metrics of a grid point, as printed by the notebook.
+    """
+    from sklearn.metrics import accuracy_score, f1_score
+    daily = portfolio_nav.pct_change()
+    trading_days = portfolio_nav.shape[0] - 1
+    tot_ret = portfolio_nav.iloc[-1] / portfolio_nav.iloc[0] - 1
+    return {
+        'final_nav':         portfolio_nav.iloc[-1],
+        'annualized_return': (1 + tot_ret)**(252/trading_days) - 1 if trading_days > 0 else np.nan,
+        'max_drawdown':      (portfolio_nav/portfolio_nav.cummax() - 1).min(),
+        'sharpe':            np.sqrt(252) * daily.mean() / daily.std(),
+        'accuracy':          accuracy_score(y_test, y_pred) if y_test else np.nan,
+        'f1_macro':          f1_score(y_test, y_pred, average='macro') if y_test else np.nan,
+    }
+
+def run_sweep(grid, Stocks_flat, SPX, first_day, today, initial_capital=10000,
+              time_delta=BDay(90), time_delta_2=BDay(10), min_sample=2,
+              max_workers=None, output_dir='.'):
+    """
+    Run the walk-forward backtest for every point of the parameter grid.
+    Parameters:
+        grid: dict, parameter name -> list of values (bw, hw, pvalue_threshold, N_top_pairs,
+              vol_thr, window_thr, lag_days)
+        Stocks_flat, SPX: market data, see prepare_market_data()
+        first_day, today: first and last day of the out-of-sample period
+        initial_capital: float, capital at first_day, reinvested from one window to the next
+        time_delta, time_delta_2: tolerance before the training start / after the oos end
+                                  of the data used to compute the indicators
+        min_sample: int, min_samples of the OPTICS clustering
+        max_workers: number of worker processes, 1 runs everything in the current process
+        output_dir: directory of the NAV and trade log files
+    Returns:
+        results: DataFrame, one row per grid point with its parameters, metrics and output files
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    data = prepare_market_data(Stocks_flat, SPX)
+    trade_days = data['trade_days']
+    trade_days = trade_days[trade_days <= today].reset_index(drop=True)
+    points = expand_grid(grid)
+
+    executor = None
+    if max_workers != 1:
+        executor = ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker, initargs=(data,))
+    else:
+        _init_worker(data)
+
+    try:
+        graph = StageGraph()
+        windows = {}
+        # Stage 1: pair candidates of each training window, shared by all grid points
+        candidate_keys = set()
+        for params in points:
+            key = (params['bw'], params['hw'])
+            if key not in windows:
+                windows[key] = rolling_windows(trade_days, first_day, *key)
+            for training_start, training_end, _, _ in windows[key]:
+                candidate_keys.add(graph.add(('candidates', training_start, training_end), _candidates_stage, (),
+                                             training_start=training_start, training_end=training_end,
+                                             min_sample=min_sample))
+        graph.run(executor, keep=candidate_keys)
+
+        # Stage 2: pair selection of each grid point, then the indicators of each (stock, data range)
+        # and the model and backtest of each (window, pair, labelling parameters)
+        point_windows = []
+        for params in points:
+            label_params = {k: params[k] for k in ('lag_days', 'window_thr', 'vol_thr')}
+            entries = []
+            for window in windows[(params['bw'], params['hw'])]:
+                training_start, training_end, _, oos_end = window
+                coin_pairs = select_top_pairs(graph.result(('candidates', training_start, training_end)),
+                                              params['pvalue_threshold'], params['N_top_pairs'])
+                start, end = training_start - time_delta, oos_end + time_delta_2
+                pair_keys = []
+                for _, row in coin_pairs.iterrows():
+                    stock1, stock2 = row['pair']
+                    h = row['hedge_ratio']
+                    deps = [graph.add(('indicators', stock, start, end), _indicator_stage, (),
+                                      ticker=stock, start=start, end=end)
+                            for stock in (stock1, stock2)]
+                    key = ('pair_model', window, (stock1, stock2), h,
+                           label_params['lag_days'], label_params['window_thr'], label_params['vol_thr'])
+                    pair_keys.append(graph.add(key, _pair_model_stage, deps, stock1=stock1, stock2=stock2,
+                                               h=h, window=window, **label_params))
+                entries.append((window, pair_keys))
+            point_windows.append(entries)
+        pair_model_keys = {key for entries in point_windows for _, keys in entries for key in keys}
+        graph.run(executor, keep=pair_model_keys)
+    finally:
+        if executor is not None:
+            executor.shutdown()
+        _init_worker(None)
+
+    # Stage 3: chain the windows of each grid point and write the results
+    rows = []
+    for params, entries in zip(points, point_windows):
+        window_results = [(window, [graph.result(key) for key in keys]) for window, keys in entries]
+        portfolio_nav, trades, y_test, y_pred, n_windows = chain_windows(window_results, first_day,
+                                                                         initial_capital)
+
+        nav_file = smartFilename(os.path.join(output_dir, 'sweep_nav.csv'), **params)
+        portfolio_nav.to_csv(nav_file, index=True)
+        trades_file = smartFilename(os.path.join(output_dir, 'sweep_trades.csv'), **params)
+        trades.to_csv(trades_file, index=False)
+
+        row = dict(params)
+        row['n_windows'] = n_windows
+        row.update(summarize(portfolio_nav, y_test, y_pred))
+        row['nav_file'] = nav_file
+        row['trades_file'] = trades_file
+        rows.append(row)
+
+    results = pd.DataFrame(rows)
+    results.to_csv(smartFilename(os.path.join(output_dir, 'sweep_results.csv')), index=False)
+    return results
+
+
+if __name__ == "__main__":
+    # Self-check of StageGraph on a tiny in-process graph: a -> (b, c) -> d
+    from concurrent.futures import ThreadPoolExecutor
+
+    for executor in (None, ThreadPoolExecutor(max_workers=2)):
+        calls = []
+        def count(*args, name):
+            calls.append(name)
+            return sum(args) + 1
+
+        graph = StageGraph()
+        graph.add('a', count, name='a')
+        graph.add('b', count, ['a'], name='b')
+        graph.add('c', count, ['a'], name='c')
+        graph.add('a', count, name='a')         # Adding it again shares the existing node
+        graph.add('d', count, ['b', 'c'], name='d')
+        graph.run(executor, keep={'d'})
+
+        # 1.. The node shared by b and c runs once
+        assert sorted(calls) == ['a', 'b', 'c', 'd'], calls
+        assert graph.result('d') == 5
+        # 2.. The results not in keep are freed once their dependents are computed
+        for key in ('a', 'b', 'c'):
+            try:
+                graph.result(key)
+                raise AssertionError('%s was not freed' % key)
+            except KeyError:
+                pass
+        # 3.. An unresolvable dependency raises
+        graph.add('e', count, ['missing'], name='e')
+        try:
+            graph.run(executor)
+            raise AssertionError('missing dependency did not raise')
+        except RuntimeError as e:
+            print('Raised as expected:', e)
+        if executor is not None:
+            executor.shutdown()
+
+    # 4.. chain_windows rescales the unit-capital NAV and divides by the number of selected
+    # pairs, a skipped pair (None) still counts like N_pairs in the notebook
+    day0, day1 = pd.Timestamp('2024-01-01'), pd.Timestamp('2024-01-02')
+    pair_nav = pd.Series([1.0, 1.1], index=[day0, day1])
+    nav, _, _, _, n_windows = chain_windows([((None, None, day0, day1),
+                                              [{'pair_nav': pair_nav, 'trades': pd.DataFrame(),
+                                                'y_test': [], 'y_pred': []}, None])],
+                                            day0, 100)
+    assert n_windows == 1 and np.isclose(nav.loc[day1], 55.0), nav
+    print('StageGraph self-check passed')
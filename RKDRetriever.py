@@ -12,9 +12,8 @@ import requests
 import json
 import numpy as np
 import pandas as pd
-import matplotlib.pyplot as plt
-import seaborn; seaborn.set()
 
+__all__ = ['RKDRetriever']
 
 class RKDRetriever:
     def __init__(self):
@@ -0,0 +1,48 @@
+# This script measures the import time of the library modules.
+# Each import runs in a fresh interpreter (like a new batch worker), the median
+# over several runs is reported together with the heavy dependencies that
+# were loaded by the import.
+# Usage: python benchmark_imports.py [repeat]
+
+import os
+import sys
+import json
+import statistics
+import subprocess
+
+MODULES = ['RKDRetriever', 'DataProcessor', 'PairsSelection', 'FeatureEngineering', 'ParameterSweep']
+HEAVY = ['matplotlib.pyplot', 'seaborn', 'ta', 'statsmodels', 'sklearn.cluster', 'sklearn.ensemble']
+
+# Executed in the child interpreter, prints the import time and the loaded heavy modules
+CHILD = '''
+import sys, time, json
+t = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - t
+print(json.dumps([elapsed, [m for m in {heavy!r} if m in sys.modules]]))
+'''
+
+def time_import(module, repeat=5):
+    """
+    Import time of a module in fresh interpreters.
+    Returns:
+        median: float, median import time in seconds
+        loaded: list, heavy dependencies loaded by the import
+    """
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    times = []
+    loaded = []
+    for _ in range(repeat):
+        out = subprocess.run([sys.executable, '-c', CHILD.format(module=module, heavy=HEAVY)],
+                             cwd=script_dir, capture_output=True, text=True, check=True)
+        elapsed, loaded = json.loads(out.stdout.strip().splitlines()[-1])
+        times.append(elapsed)
+    return statistics.median(times), loaded
+
+
+if __name__ == '__main__':
+    repeat = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    print('%-20s %10s   %s' % ('module', 'median(s)', 'heavy modules loaded'))
+    for module in MODULES:
+        median, loaded = time_import(module, repeat)
+        print('%-20s %10.3f   %s' % (module, median, ', '.join(loaded) or '-'))
@@ -0,0 +1,28 @@
+# setup_plotting() imports matplotlib.pyplot and applies the seaborn style.
+# Set the environment variable PAIRTRADING_HEADLESS=1 (e.g. for batch workers)
+# to use a non-interactive matplotlib backend and skip the seaborn styling.
+
+import os
+
+__all__ = ['HEADLESS', 'setup_plotting']
+
+HEADLESS = os.environ.get('PAIRTRADING_HEADLESS', '').lower() not in ('', '0', 'false', 'no')
+
+def setup_plotting(headless=None):
+    """
+    Import matplotlib.pyplot and apply the seaborn style.
+    Parameters:
+        headless: bool, use the Agg backend and skip seaborn, defaults to HEADLESS
+    Returns:
+        plt: the matplotlib.pyplot module
+    """
+    if headless is None:
+        headless = HEADLESS
+    import matplotlib
+    if headless:
+        matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    if not headless:
+        import seaborn
+        seaborn.set()
+    return plt